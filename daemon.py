@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+"""
+Daemon - Long-lived model server so the CLI skips the model load on every call
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+# asyncio is only needed by the server; the CLI imports this module for DaemonClient
+if TYPE_CHECKING:
+    import asyncio
+
+# Seconds the CLI waits for a freshly spawned daemon to finish loading the model
+SPAWN_TIMEOUT = 60
+
+# Socket timeouts: pings are answered without touching the model; a generate
+# request may queue behind another client's and still has to prefill and decode
+PING_TIMEOUT = 2
+GENERATE_TIMEOUT = 120
+
+# Seconds without requests before the daemon exits and frees the model memory
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+
+def default_socket_path() -> str:
+    """Socket location: $XDG_RUNTIME_DIR on Linux, the giti cache dir elsewhere"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "giti"
+        )
+    return os.path.join(runtime_dir, "giti.sock")
+
+
+class DaemonClient:
+    """Talks to a running giti daemon; exposes the same generate() as LLMRunner"""
+    
+    def __init__(self, model_path: str, use_cache: bool = True, socket_path: Optional[str] = None):
+        """
+        Initialize the daemon client
+        
+        Args:
+            model_path: Model the daemon is expected to serve
+            use_cache: If True, let the daemon answer from its response cache
+            socket_path: Path of the daemon's UNIX socket
+        """
+        self.model_path = model_path
+        self.use_cache = use_cache
+        self.socket_path = socket_path or default_socket_path()
+    
+    @classmethod
+    def connect(cls, model_path: str, use_cache: bool = True) -> Optional["DaemonClient"]:
+        """
+        Return a client for a running daemon, spawning one if none is listening
+        
+        Returns:
+            A ready client, or None if no daemon could be reached
+        """
+        client = cls(model_path, use_cache)
+        served = client._served_model()
+        if served == os.path.abspath(model_path):
+            return client
+        if served is not None:
+            return None  # A daemon for another model owns the socket
+        
+        print("🚀 Starting giti daemon...")
+        try:
+            process = client._spawn()
+        except OSError:
+            return None
+        
+        deadline = time.monotonic() + SPAWN_TIMEOUT
+        while time.monotonic() < deadline and process.poll() is None:
+            if client.ping():
+                print("✅ Model ready!")
+                return client
+            time.sleep(0.1)
+        
+        # Give up on it entirely, or the caller's in-process fallback would load a second copy of the model
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        return None
+    
+    def ping(self) -> bool:
+        """Return True if a daemon serving this model is listening"""
+        return self._served_model() == os.path.abspath(self.model_path)
+    
+    def _served_model(self) -> Optional[str]:
+        """Return the model path of the listening daemon, or None if there is none"""
+        try:
+            return self._request({"ping": True}, PING_TIMEOUT).get("model_path")
+        except (OSError, ValueError):
+            return None
+    
+    def generate(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """
+        Generate git commands through the daemon
+        
+        Args:
+            prompt: Input prompt for the model
+            prefix: Query-independent start of prompt (see LLMRunner.generate)
+        
+        Returns:
+            Generated git command(s)
+        """
+        try:
+            response = self._request(
+                {"prompt": prompt, "prefix": prefix, "use_cache": self.use_cache}, GENERATE_TIMEOUT
+            )
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Error talking to giti daemon: {e}")
+        
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["text"]
+    
+    def cleanup(self):
+        """Nothing to release; the daemon keeps the model loaded"""
+    
+    def _request(self, payload: dict, timeout: float) -> dict:
+        """Send one JSON line and read one JSON line back, raising socket.timeout after timeout seconds"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ValueError("empty response from daemon")
+        return json.loads(line)
+    
+    def _spawn(self) -> subprocess.Popen:
+        """Start a detached daemon for this model"""
+        return subprocess.Popen(
+            [
+                sys.executable,
+                str(Path(__file__).parent.absolute() / "daemon.py"),
+                "--model-path", os.path.abspath(self.model_path),
+                "--socket", os.path.abspath(self.socket_path),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            cwd="/",  # Don't keep the directory giti was started from busy (or unmountable)
+            start_new_session=True,
+        )
+
+
+class DaemonServer:
+    """Holds a single LLMRunner and answers generate requests over a UNIX socket"""
+    
+    def __init__(self, model_path: str, socket_path: str, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        Initialize the daemon server
+        
+        Args:
+            model_path: Path to the GGUF model file
+            socket_path: Path of the UNIX socket to listen on
+            idle_timeout: Seconds without requests before shutting down
+        """
+        import asyncio
+        from llm_runner import LLMRunner
+        
+        self.model_path = os.path.abspath(model_path)
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        model_stat = os.stat(self.model_path)
+        self.runner = LLMRunner(self.model_path, f"{model_stat.st_size}:{model_stat.st_mtime_ns}")
+        self._lock = asyncio.Lock()
+        self._last_request = time.monotonic()
+    
+    async def serve(self):
+        """Listen until idle for longer than idle_timeout"""
+        import asyncio
+        
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Stale socket from a previous daemon
+        
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        try:
+            async with server:
+                while time.monotonic() - self._last_request < self.idle_timeout:
+                    await asyncio.sleep(min(60, self.idle_timeout))
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.runner.cleanup()
+    
+    async def _handle(self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter"):
+        """Answer a single JSON-line request"""
+        import asyncio
+        
+        self._last_request = time.monotonic()
+        try:
+            request = json.loads(await reader.readline())
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            if request.get("ping"):
+                response = {"model_path": self.model_path}
+            else:
+                # llama.cpp contexts are not re-entrant; serve one prompt at a time
+                async with self._lock:
+                    response = await asyncio.get_running_loop().run_in_executor(
+                        None, self._generate, request["prompt"], request.get("prefix"),
+                        request.get("use_cache", True)
+                    )
+        except (ValueError, KeyError) as e:
+            response = {"error": f"Bad request: {e}"}
+        
+        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+        await writer.drain()
+        writer.close()
+    
+    def _generate(self, prompt: str, prefix: Optional[str], use_cache: bool) -> dict:
+        """Run the model, reporting failures back to the client"""
+        self.runner.use_cache = use_cache
+        try:
+            return {"text": self.runner.generate(prompt, prefix)}
+        except Exception as e:
+            return {"error": str(e)}
+
+
+def main():
+    script_dir = Path(__file__).parent.absolute()
+    default_model_path = script_dir / "models" / "Qwen2.5-Coder-1.5B-Instruct-Q4_K_M.gguf"
+    
+    parser = argparse.ArgumentParser(
+        description="Keep the giti model loaded and serve requests over a UNIX socket",
+        prog="giti-daemon"
+    )
+    
+    parser.add_argument(
+        "--model-path",
+        type=str,
+        default=str(default_model_path),
+        help="Path to the GGUF model file"
+    )
+    
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=default_socket_path(),
+        help="Path of the UNIX socket to listen on"
+    )
+    
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        metavar="SECONDS",
+        help="Exit after this many seconds without requests"
+    )
+    
+    args = parser.parse_args()
+    
+    import asyncio
+    
+    server = DaemonServer(args.model_path, args.socket, args.idle_timeout)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
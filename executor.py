@@ -2,37 +2,91 @@
 Executor - Command execution with confirmation and dry-run support
 """
 
+import codecs
+import selectors
 import subprocess
 import shlex
-from typing import List
+import time
+from typing import List, Optional, Tuple
 import os
+import re
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    process = None  # Optional: fall back to the pure-Python matcher
+
+# How long a `git branch -a` listing is reused before re-querying git
+BRANCH_CACHE_TTL = 2.0
+
+# Per-command timeout in seconds
+COMMAND_TIMEOUT = 30
+
+# How much streamed stderr is kept for error analysis
+STDERR_TAIL_BYTES = 64 * 1024
+
+# How much of stderr the error heuristics look at
+ERROR_HEAD_CHARS = 512
+
+# Accepted values for the on_error policy
+ON_ERROR_POLICIES = ("ask", "abort", "continue")
+
+# Subcommands that never modify the repository and may run concurrently. Their
+# output is buffered, so log and diff (read-only, but often huge) run on their
+# own instead and stream
+READ_ONLY_SUBCOMMANDS = ("status", "rev-parse")
+
+# Arguments that keep `git branch` a pure listing
+BRANCH_LIST_FLAGS = ("-a", "--all", "-r", "--remotes", "-v", "-vv", "--verbose", "--list")
 
 
 class CommandExecutor:
     """Handles execution of Git commands with safety features"""
     
-    def __init__(self, dry_run: bool = False, no_confirm: bool = False, working_directory=None):
+    # stderr patterns for unknown branches, files, or commits
+    _PATHSPEC_RE = re.compile(r"pathspec .* did not match", re.IGNORECASE)
+    _DIDNT_MATCH_RE = re.compile(r"did not match any file", re.IGNORECASE)
+    
+    def __init__(self, dry_run: bool = False, no_confirm: bool = False, working_directory=None,
+                 sequential: bool = False, on_error: str = "ask"):
         """
         Initialize the command executor
         
         Args:
             dry_run: If True, only show commands without executing
             no_confirm: If True, skip confirmation prompts
+            sequential: If True, never run read-only commands concurrently
+            on_error: What to do after a failed command: "abort", "continue",
+                or "ask" (prompt unless no_confirm is set)
         """
+        if on_error not in ON_ERROR_POLICIES:
+            raise ValueError(f"on_error must be one of {', '.join(ON_ERROR_POLICIES)}")
+        
         self.dry_run = dry_run
         self.no_confirm = no_confirm
+        self.sequential = sequential
+        self.on_error = on_error
         self.working_directory = working_directory or os.getcwd()  # Use provided directory or current
+        self._branch_cache = None
+        self._branch_cache_ts = 0.0
+        
+        # Equivalent to `git --no-optional-locks`: reads such as `git status` skip
+        # refreshing the index, so concurrent read-only commands don't contend on index.lock
+        self._env = {**os.environ, "GIT_OPTIONAL_LOCKS": "0"}
     
-    def execute_commands(self, commands: List[str]) -> None:
+    def execute_commands(self, commands: List[str]) -> bool:
         """
         Execute a list of Git commands
         
         Args:
             commands: List of Git commands to execute
+            
+        Returns:
+            True if the commands were confirmed and all of them succeeded
         """
         if not commands:
             print("❌ No commands to execute")
-            return
+            return False
         
         # Display commands
         print("Generated commands:")
@@ -42,100 +96,290 @@ class CommandExecutor:
         
         if self.dry_run:
             print("Dry run mode - commands not executed")
-            return
+            return False
         
         # Get confirmation unless --no-confirm is used
         if not self.no_confirm:
             if not self._get_confirmation():
                 print("❌ Execution cancelled")
-                return
+                return False
+        
+        # Tokenize every command once up front; argv lists are passed through from here
+        plan = [(cmd, self._tokenize(cmd)) for cmd in commands]
         
-        # Execute commands
+        # Execute commands, overlapping independent read-only ones
         print("🚀 Executing commands...")
-        for i, cmd in enumerate(commands, 1):
-            print(f"\n[{i}/{len(commands)}] {cmd}")
+        total = len(plan)
+        i = 0
+        all_succeeded = True
+        for batch in self._schedule(plan):
+            if len(batch) == 1:
+                # Barrier commands stream their output live
+                cmd, argv = batch[0]
+                i += 1
+                print(f"\n[{i}/{total}] {cmd}")
+                outcome = self._run_command(argv)
+                all_succeeded = all_succeeded and self._succeeded(outcome)
+                if not self._handle_outcome(argv, outcome, i, total, streamed=True):
+                    print("🛑 Execution stopped")
+                    break
+                continue
             
-            try:
-                result = subprocess.run(
-                    shlex.split(cmd),
-                    capture_output=True,
-                    text=True,
-                    cwd=self.working_directory,
-                    timeout=30  # 30 second timeout
-                )
-                
-                if result.returncode == 0:
-                    print("✅ Success")
-                    if result.stdout.strip():
-                        print(f"📤 Output:\n{result.stdout}")
-                else:
-                    print(f"❌ Error (exit code {result.returncode})")
-                    if result.stderr.strip():
-                        print(f"📥 Error output:\n{result.stderr}")
-                        
-                        # try alternatives
-                        error_msg = result.stderr.lower()
-                        retry_attempted = False
-                        
-                        if "pathspec" in error_msg and "did not match" in error_msg:
-                            retry_attempted = self._try_branch_alternatives(cmd, i, len(commands))
-                        
-                        if not retry_attempted:
-                            # Show suggestions if no auto-retry was possible
-                            if "pathspec" in error_msg and "did not match" in error_msg:
-                                print("\n💡 Suggestion: The reference doesn't exist (branch, file, or commit).")
-                                print("Try these commands to check what's available:")
-                                print("  git branch -a    # See all branches")
-                                print("  git log --oneline # See recent commits")
-                                print("  git status       # See current state")
-                            elif "did not match any file" in error_msg:
-                                print("\n💡 Suggestion: The reference doesn't exist.")
-                                print("Check available options with: git branch -a")
-                        
-                        # Ask if user wants to continue with remaining commands (if no successful retry)
-                        if not retry_attempted and i < len(commands) and not self.no_confirm:
-                            if not self._get_continue_confirmation():
-                                print("🛑 Execution stopped")
-                                break
-                    else:
-                        # No stderr but still failed
-                        if i < len(commands) and not self.no_confirm:
-                            if not self._get_continue_confirmation():
-                                print("🛑 Execution stopped")
-                                break
-                        
-            except subprocess.TimeoutExpired:
-                print("Command timed out after 30 seconds")
-                if i < len(commands) and not self.no_confirm:
-                    if not self._get_continue_confirmation():
-                        print("🛑 Execution stopped")
-                        break
-                        
-            except Exception as e:
-                print(f"❌ Unexpected error: {e}")
-                if i < len(commands) and not self.no_confirm:
-                    if not self._get_continue_confirmation():
-                        print("🛑 Execution stopped")
-                        break
+            # Concurrent output is buffered and reported in plan order
+            import asyncio  # Only needed for concurrent batches; slow to import
+            outcomes = asyncio.run(self._run_parallel([argv for _, argv in batch]))
+            all_succeeded = all_succeeded and all(self._succeeded(outcome) for outcome in outcomes)
+            failed = False
+            for (cmd, argv), outcome in zip(batch, outcomes):
+                i += 1
+                print(f"\n[{i}/{total}] {cmd}")
+                if not self._handle_outcome(argv, outcome, i, total, decide=False):
+                    failed = True
+            
+            # The whole batch has already run, so only the commands after it are in question
+            if failed:
+                print(f"\nℹ️  Commands {i - len(batch) + 1}-{i} ran concurrently; all of them already finished")
+                if not self._should_continue(i, total):
+                    print("🛑 Execution stopped")
+                    break
         
         print("\n✨ Command execution completed")
+        return all_succeeded
+    
+    @staticmethod
+    def _succeeded(outcome) -> bool:
+        """Return True if a command outcome is a zero exit status"""
+        return isinstance(outcome, subprocess.CompletedProcess) and outcome.returncode == 0
+    
+    @staticmethod
+    def _tokenize(cmd: str) -> Optional[List[str]]:
+        """Split a command into argv, or None if it cannot be parsed"""
+        try:
+            return shlex.split(cmd, posix=True)
+        except ValueError:
+            return None
+    
+    def _schedule(self, plan: List[Tuple[str, Optional[List[str]]]]) -> list:
+        """
+        Group commands into batches that can run concurrently
+        
+        Consecutive read-only commands share a batch; every mutating command
+        is a barrier and runs on its own. In sequential mode each command is
+        its own batch.
+        """
+        batches = []
+        current = []
+        for entry in plan:
+            if not self.sequential and self._dependency_safe(entry[1]):
+                current.append(entry)
+                continue
+            if current:
+                batches.append(current)
+                current = []
+            batches.append([entry])
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _dependency_safe(self, argv: Optional[List[str]]) -> bool:
+        """Return True if the command only reads repository state"""
+        if not argv or len(argv) < 2 or argv[0] != "git":
+            return False
+        subcommand, args = argv[1], argv[2:]
+        if subcommand == "branch":
+            # Listing only; any other argument may create/delete/rename
+            return all(arg in BRANCH_LIST_FLAGS for arg in args)
+        return subcommand in READ_ONLY_SUBCOMMANDS
+    
+    def _run_command(self, argv: Optional[List[str]]):
+        """
+        Run a single command, streaming its stdout to the terminal as it arrives
+        
+        Returns:
+            A CompletedProcess whose stderr holds the last STDERR_TAIL_BYTES of
+            error output (stdout is not retained), or the raised exception
+        """
+        if argv is None:
+            return ValueError("could not parse command (unbalanced quotes?)")
+        try:
+            proc = subprocess.Popen(
+                argv,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=self.working_directory,
+                env=self._env
+            )
+        except Exception as e:
+            return e
+        
+        stderr_tail = ""
+        printed_header = False
+        line_open = False  # Streamed output so far doesn't end with a newline
+        deadline = time.monotonic() + COMMAND_TIMEOUT
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ, codecs.getincrementaldecoder("utf-8")("replace"))
+            selector.register(proc.stderr, selectors.EVENT_READ, codecs.getincrementaldecoder("utf-8")("replace"))
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    proc.kill()
+                    proc.wait()
+                    if line_open:
+                        print()
+                    return subprocess.TimeoutExpired(argv, COMMAND_TIMEOUT)
+                
+                for key, _ in selector.select(remaining):
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    
+                    text = key.data.decode(chunk)
+                    if not text:
+                        continue  # Only part of a multi-byte character so far
+                    if key.fileobj is proc.stderr:
+                        # Kept for error analysis; only shown if the command fails
+                        stderr_tail = (stderr_tail + text)[-STDERR_TAIL_BYTES:]
+                        continue
+                    
+                    if not printed_header:
+                        print("📤 Output:")
+                        printed_header = True
+                    print(text, end="", flush=True)
+                    line_open = not text.endswith("\n")
+        
+        # Keep the status line that follows off the output's last line
+        if line_open:
+            print()
+        
+        proc.stdout.close()
+        proc.stderr.close()
+        return subprocess.CompletedProcess(argv, proc.wait(), "", stderr_tail)
+    
+    @staticmethod
+    def _print_output(stdout: str) -> None:
+        """Print captured stdout the way _run_command streams it, ending on a newline"""
+        print("📤 Output:")
+        print(stdout, end="" if stdout.endswith("\n") else "\n")
+    
+    async def _run_parallel(self, batch: List[List[str]]) -> list:
+        """Run a batch of independent commands concurrently"""
+        import asyncio
+        return await asyncio.gather(*[self._run_command_async(argv) for argv in batch])
+    
+    async def _run_command_async(self, argv: List[str]):
+        """Async counterpart of _run_command"""
+        import asyncio
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.working_directory,
+                env=self._env
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), COMMAND_TIMEOUT)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                return subprocess.TimeoutExpired(argv, COMMAND_TIMEOUT)
+            return subprocess.CompletedProcess(
+                argv,
+                proc.returncode,
+                stdout.decode(errors="replace"),
+                stderr.decode(errors="replace")
+            )
+        except Exception as e:
+            return e
+    
+    def _handle_outcome(self, argv: Optional[List[str]], outcome, i: int, total: int,
+                        streamed: bool = False, decide: bool = True) -> bool:
+        """
+        Report the outcome of a command and handle failures
+        
+        Args:
+            streamed: If True, stdout was already printed while the command ran
+            decide: If False, report a failure without applying the on_error
+                policy; the caller decides once the rest of its batch is reported
+        
+        Returns:
+            False if execution should stop (or, with decide=False, the command failed), True otherwise
+        """
+        if isinstance(outcome, subprocess.TimeoutExpired):
+            print(f"Command timed out after {COMMAND_TIMEOUT} seconds")
+            return decide and self._should_continue(i, total)
+        
+        if isinstance(outcome, Exception):
+            print(f"❌ Unexpected error: {outcome}")
+            return decide and self._should_continue(i, total)
+        
+        result = outcome
+        # Output before the status line, in the order a streamed command shows them
+        if not streamed and result.stdout.strip():
+            self._print_output(result.stdout)
+        
+        if result.returncode == 0:
+            print("✅ Success")
+            self._invalidate_branch_cache_if_needed(argv)
+            return True
+        
+        print(f"❌ Error (exit code {result.returncode})")
+        if not result.stderr.strip():
+            # No stderr but still failed
+            return decide and self._should_continue(i, total)
+        
+        print(f"📥 Error output:\n{result.stderr}")
+        
+        # try alternatives; git reports pathspec errors up front, so only the head is inspected
+        error_head = result.stderr[:ERROR_HEAD_CHARS]
+        missing_ref = self._PATHSPEC_RE.search(error_head) is not None
+        retry_attempted = False
+        
+        if missing_ref:
+            retry_attempted = self._try_branch_alternatives(argv, i, total)
+        
+        if retry_attempted:
+            return True
+        
+        # Show suggestions if no auto-retry was possible
+        if missing_ref:
+            print("\n💡 Suggestion: The reference doesn't exist (branch, file, or commit).")
+            print("Try these commands to check what's available:")
+            print("  git branch -a    # See all branches")
+            print("  git log --oneline # See recent commits")
+            print("  git status       # See current state")
+        elif self._DIDNT_MATCH_RE.search(error_head):
+            print("\n💡 Suggestion: The reference doesn't exist.")
+            print("Check available options with: git branch -a")
+        
+        # Ask if user wants to continue with remaining commands
+        return decide and self._should_continue(i, total)
+    
+    def _should_continue(self, i: int, total: int) -> bool:
+        """Decide whether to continue after a failure, if there is anything left"""
+        if i >= total:
+            return True
+        if self.on_error == "abort":
+            return False
+        if self.on_error == "continue" or self.no_confirm:
+            return True
+        return self._get_continue_confirmation()
     
-    def _try_branch_alternatives(self, original_cmd: str, cmd_index: int, total_commands: int) -> bool:
+    def _try_branch_alternatives(self, original_argv: List[str], cmd_index: int, total_commands: int) -> bool:
         """
         Try alternative commands when branch operations fail
         Returns True if a successful retry was made, False otherwise
         """
-        cmd_lower = original_cmd.lower()
-        
-        if not ("checkout" in cmd_lower or "switch" in cmd_lower):
+        # Match the subcommand token, not substrings (branch names may contain "checkout")
+        if len(original_argv) < 3 or original_argv[0] != "git":
             return False
-            
-        # Extract branch name from checkout/switch commands
-        parts = shlex.split(original_cmd)
-        if len(parts) < 2:
+        subcommand = original_argv[1]
+        if subcommand not in ("checkout", "switch"):
             return False
             
-        target_branch = parts[-1]  # Last argument is usually the branch
+        # Extract branch name from checkout/switch commands
+        target_branch = original_argv[-1]  # Last argument is usually the branch
         
         # Get all available branches
         available_branches = self._get_available_branches()
@@ -150,16 +394,13 @@ class CommandExecutor:
         # Strategy 1: Exact case-insensitive matches
         exact_matches = [b for b in available_branches if b.lower() == target_branch.lower() and b != target_branch]
         for exact_match in exact_matches[:1]:  # Only try the first exact match
-            if "checkout" in cmd_lower:
-                retry_commands.append(f"git checkout {exact_match}")
-            elif "switch" in cmd_lower:
-                retry_commands.append(f"git switch {exact_match}")
+            retry_commands.append(["git", subcommand, exact_match])
         
         # Strategy 2: Create the exact branch the user asked for
-        if "checkout" in cmd_lower:
-            retry_commands.append(f"git checkout -b {target_branch}")
-        elif "switch" in cmd_lower:
-            retry_commands.append(f"git switch -c {target_branch}")
+        if subcommand == "checkout":
+            retry_commands.append(["git", "checkout", "-b", target_branch])
+        else:
+            retry_commands.append(["git", "switch", "-c", target_branch])
             
         # Strategy 3: Fuzzy matches as suggestions only (don't auto-execute)
         similar_branches = self._find_similar_branches(target_branch, available_branches)
@@ -169,21 +410,23 @@ class CommandExecutor:
         
         # Try each alternative
         for retry_cmd in retry_commands:
-            print(f"\n🔄 Trying alternative: {retry_cmd}")
+            print(f"\n🔄 Trying alternative: {shlex.join(retry_cmd)}")
             
             try:
                 retry_result = subprocess.run(
-                    shlex.split(retry_cmd),
+                    retry_cmd,
                     capture_output=True,
                     text=True,
                     cwd=self.working_directory,
-                    timeout=30
+                    env=self._env,
+                    timeout=COMMAND_TIMEOUT
                 )
                 
                 if retry_result.returncode == 0:
-                    print("✅ Alternative succeeded!")
                     if retry_result.stdout.strip():
-                        print(f"📤 Output:\n{retry_result.stdout}")
+                        self._print_output(retry_result.stdout)
+                    print("✅ Alternative succeeded!")
+                    self._branch_cache = None
                     return True
                 else:
                     print(f"❌ Alternative failed: {retry_result.stderr.strip()}")
@@ -199,32 +442,49 @@ class CommandExecutor:
         
         return False
     
+    def _invalidate_branch_cache_if_needed(self, argv: List[str]) -> None:
+        """Drop the cached branch list after commands that can change branches"""
+        if len(argv) > 1 and argv[1] in ("checkout", "switch", "fetch", "pull", "branch"):
+            self._branch_cache = None
+    
     def _get_available_branches(self) -> list:
-        """Get list of all available branches (local and remote)"""
+        """Get list of all available branches (local and remote), cached briefly"""
+        if self._branch_cache is not None and time.monotonic() - self._branch_cache_ts < BRANCH_CACHE_TTL:
+            return self._branch_cache
+        
+        self._branch_cache = self._list_branches()
+        self._branch_cache_ts = time.monotonic()
+        return self._branch_cache
+    
+    def _list_branches(self) -> list:
+        """Query git for all available branches (local and remote)"""
         try:
             result = subprocess.run(
-                ["git", "branch", "-a"],
+                ["git", "for-each-ref", "--format=%(refname)", "refs/heads", "refs/remotes"],
                 capture_output=True,
                 text=True,
                 cwd=self.working_directory,
+                env=self._env,
                 timeout=10
             )
             
             if result.returncode != 0:
                 return []
             
-            branches = []
-            for line in result.stdout.strip().split('\n'):
-                if line.strip():
-                    # Clean up branch names (remove *, whitespace, remotes/origin/)
-                    branch = line.strip().replace('*', '').strip()
-                    if branch.startswith('remotes/origin/'):
-                        branch = branch.replace('remotes/origin/', '')
-                    if branch and branch != 'HEAD' and '->' not in branch:
-                        branches.append(branch)
+            # Full refnames are undecorated; show origin's branches under their plain name
+            branches = {}
+            for ref in result.stdout.splitlines():
+                if ref.startswith("refs/heads/"):
+                    branches[ref[len("refs/heads/"):]] = None
+                elif ref.endswith("/HEAD"):
+                    continue  # refs/remotes/<remote>/HEAD points at a branch, it isn't one
+                elif ref.startswith("refs/remotes/origin/"):
+                    branches[ref[len("refs/remotes/origin/"):]] = None
+                else:
+                    branches[ref[len("refs/"):]] = None
             
-            # Remove duplicates and return
-            return list(set(branches))
+            # Deduplicated, in git's sorted order
+            return list(branches)
             
         except Exception:
             return []
@@ -234,13 +494,21 @@ class CommandExecutor:
         if not available:
             return []
             
-        similar = []
         target_lower = target.lower()
         
         # Exact matches first (case insensitive)
-        for branch in available:
-            if branch.lower() == target_lower:
-                similar.append(branch)
+        similar = [branch for branch in available if branch.lower() == target_lower]
+        
+        # Every branch stays a candidate: substring matches such as "login-pag" in
+        # "feature/login-page" share neither a prefix nor a suffix with the target
+        if process is not None:
+            # Score all branches in C; keys are pre-lowered once
+            lowered = {branch.lower(): branch for branch in available}
+            for match, _, _ in process.extract(target_lower, list(lowered), scorer=fuzz.WRatio,
+                                                score_cutoff=60, limit=3):
+                if lowered[match] not in similar:
+                    similar.append(lowered[match])
+            return similar[:3]
         
         # Partial matches
         for branch in available:
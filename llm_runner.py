@@ -4,15 +4,45 @@ LLM Runner - Interface for llama.cpp model inference
 
 import os
 import sys
+import json
+import hashlib
+import tempfile
+import zipfile
+import atexit
 import contextlib
-from typing import Optional
+from typing import List, Optional, Tuple
 
 try:
+    import llama_cpp
+    import numpy as np  # Installed with llama-cpp-python
     from llama_cpp import Llama
 except ImportError:
     print("Error: llama-cpp-python not installed. Run: pip install llama-cpp-python")
     exit(1)
 
+# Saved llama.cpp state after evaluating a prompt prefix, one file per distinct prefix
+KV_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "giti", "kv"
+)
+KV_CACHE_MAX_FILES = 8  # ~12MB each for the default model; one per context file in regular use
+
+# Where generated responses are memoized, keyed by prompt + model + sampling params
+RESPONSE_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "giti", "llm"
+)
+
+SYSTEM_PROMPT = "You are a Git command expert. Respond only with valid Git commands, nothing else."
+
+# ChatML framing for Qwen models, rendered once instead of per call by the chat handler
+CHATML_PREFIX = f"<|im_start|>system\n{SYSTEM_PROMPT}<|im_end|>\n<|im_start|>user\n"
+CHATML_SUFFIX = "<|im_end|>\n<|im_start|>assistant\n"
+CHATML_STOP = ["<|im_end|>", "<|im_start|>"]
+TOP_P = 0.8  # Slightly higher for speed
+TOP_K = 20   # Lower for faster sampling
+
+# Git commands fit in a few dozen tokens; the stop sequences end generation before this
+MAX_TOKENS_CAP = 64
+
 
 @contextlib.contextmanager
 def suppress_stderr():
@@ -29,85 +59,287 @@ def suppress_stderr():
 class LLMRunner:
     """Handles local LLM inference using llama.cpp"""
     
-    def __init__(self, model_path: str, max_tokens: int = 50, temperature: float = 0.1):
+    def __init__(self, model_path: str, model_version: str, max_tokens: int = 50, temperature: float = 0.1,
+                 use_cache: bool = True, n_ctx: int = 1024):
         """
         Initialize the LLM runner for Qwen2.5-Coder with speed optimizations
         
         Args:
             model_path: Path to the GGUF model file
+            model_version: Size and mtime of the model file from the caller's stat,
+                identifying it in the on-disk cache keys
             max_tokens: Maximum tokens to generate (reduced for speed)
             temperature: Sampling temperature
+            use_cache: If True, memoize responses on disk
+            n_ctx: Context window; the prompt builder stays well under 1024 tokens
         """
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
-        
         self.model_path = model_path
-        self.max_tokens = max_tokens
+        self.model_version = model_version
+        self.max_tokens = min(max_tokens, MAX_TOKENS_CAP)
+        self.n_ctx = n_ctx
         self.temperature = temperature
+        self.use_cache = use_cache
+        self._prefix_key = None  # Prefix whose state is currently loaded in the model
+        self._prefix_tokens = None  # (prefix, token IDs, state key) of the last prefix seen
         
         print("🚀 Loading AI model...")
         
         # Suppress all the verbose GGML/Metal logging during model load
-        with suppress_stderr():
-            self.llm = Llama(
-                model_path=model_path,
-                n_ctx=1024,  # Smaller context for speed
-                n_threads=None,  # Use all available CPU threads
-                verbose=False,  # Suppress llama.cpp logs
-                seed=42,  # For reproducible results
-                chat_format="chatml",  # Use ChatML format for Qwen models
-                n_batch=256,  # Smaller batch for speed
-                use_mmap=True,  # Memory mapping for faster loading
-                use_mlock=False,  # Don't lock memory for faster startup
-                n_gpu_layers=0,  # CPU only for consistency
-            )
+        try:
+            with suppress_stderr():
+                self.llm = Llama(
+                    model_path=model_path,
+                    n_ctx=n_ctx,  # Smaller context for speed
+                    n_threads=self._physical_cores(),  # One thread per core; SMT siblings slow decode
+                    n_threads_batch=os.cpu_count(),  # Prefill scales with every logical CPU
+                    verbose=False,  # Suppress llama.cpp logs
+                    seed=42,  # For reproducible results
+                    n_batch=256,  # Smaller batch for speed
+                    use_mmap=True,  # Memory mapping for faster loading
+                    use_mlock=False,  # Don't lock memory for faster startup
+                    n_gpu_layers=self._detect_gpu_layers(),  # Offload everything when Metal/CUDA is available
+                )
+        except ValueError as e:
+            # llama-cpp-python reports a missing model path as ValueError
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model file not found: {model_path}") from e
+            raise
+        
+        atexit.register(self.cleanup)
         
         print("✅ Model ready!")
     
-    def generate(self, prompt: str) -> str:
+    @staticmethod
+    def _physical_cores() -> int:
+        """Number of physical CPU cores, estimated as half the logical CPUs without psutil"""
+        try:
+            import psutil
+            cores = psutil.cpu_count(logical=False)
+        except ImportError:
+            cores = None
+        return cores or max(1, (os.cpu_count() or 2) // 2)
+    
+    @staticmethod
+    def _detect_gpu_layers() -> int:
+        """Return -1 (offload all layers) if this llama.cpp build supports GPU offload, else 0"""
+        try:
+            return -1 if llama_cpp.llama_supports_gpu_offload() else 0
+        except AttributeError:
+            # Older llama-cpp-python without the capability probe
+            return 0
+    
+    def generate(self, prompt: str, prefix: Optional[str] = None) -> str:
         """
         Generate git commands using Qwen2.5-Coder (optimized for speed)
         
+        Identical prompts are answered from the on-disk response cache
+        without touching the model.
+        
         Args:
             prompt: Input prompt for the model
+            prefix: Query-independent start of prompt whose evaluated state
+                is saved and restored instead of being prefilled every call
             
         Returns:
             Generated git command(s)
         """
+        cache_path = self._response_cache_path(prompt) if self.use_cache else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)["text"]
+            except (OSError, ValueError, KeyError):
+                pass  # Corrupt entry, regenerate below
+        
+        generated_text = self._generate(prompt, prefix)
+        
+        if cache_path:
+            self._store_response(cache_path, generated_text)
+        
+        return generated_text
+    
+    def _response_cache_path(self, prompt: str) -> str:
+        """Build the cache file path for a prompt under the current model and sampling params"""
+        key = "|".join([
+            prompt,
+            SYSTEM_PROMPT,
+            self.model_path,
+            self.model_version,
+            str(self.max_tokens),
+            str(self.temperature),
+            str(TOP_P),
+            str(TOP_K),
+        ])
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(RESPONSE_CACHE_DIR, f"{digest}.json")
+    
+    @staticmethod
+    def _store_response(cache_path: str, text: str) -> None:
+        """Atomically write a response to the cache, ignoring I/O failures"""
+        try:
+            os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=RESPONSE_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"text": text}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    
+    def _generate(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """Run the model on a prompt"""
         try:
-            # Use chat completion for better instruction following
-            response = self.llm.create_chat_completion(
-                messages=[
-                    {"role": "system", "content": "You are a Git command expert. Respond only with valid Git commands, nothing else."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.max_tokens,
+            # Raw completion over a pre-rendered ChatML prompt; the static system
+            # prefix is identical every call, so llama.cpp skips re-evaluating the
+            # tokens it already holds from the previous call or a restored state.
+            # Tokenize here so generation can be sized to the remaining context
+            if prefix and prompt.startswith(prefix):
+                # Only the query is tokenized; the prefix IDs are reused across calls
+                prefix_tokens, prefix_key = self._get_prefix_tokens(prefix)
+                prompt_tokens = prefix_tokens + self.llm.tokenize(
+                    (prompt[len(prefix):] + CHATML_SUFFIX).encode("utf-8"), add_bos=False, special=True
+                )
+            else:
+                prefix_tokens = None
+                prompt_tokens = self.llm.tokenize(
+                    (CHATML_PREFIX + prompt + CHATML_SUFFIX).encode("utf-8"), special=True
+                )
+            
+            budget = self.n_ctx - len(prompt_tokens)
+            if budget <= 0:
+                raise ValueError(f"prompt is {len(prompt_tokens)} tokens, context window is {self.n_ctx}")
+            
+            if prefix_tokens:
+                self._restore_prefix_state(prefix_tokens, prefix_key)
+            
+            chunks = self.llm(
+                prompt_tokens,
+                max_tokens=min(self.max_tokens, budget),
                 temperature=self.temperature,
-                top_p=0.8,  # Slightly higher for speed
-                top_k=20,   # Lower for faster sampling
-                stream=False
+                top_p=TOP_P,
+                top_k=TOP_K,
+                stop=CHATML_STOP,
+                echo=False,
+                stream=True
             )
             
-            generated_text = response['choices'][0]['message']['content'].strip()
+            generated_text = self._collect_commands(chunks).strip()
             return generated_text
             
         except Exception as e:
-            # Fallback to regular completion if chat format fails
-            try:
-                response = self.llm(
-                    prompt,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    top_p=0.8,
-                    top_k=20,
-                    stop=["Human:", "Assistant:", "\n\n"],
-                    echo=False,
-                    stream=False
-                )
-                return response['choices'][0]['text'].strip()
-            except Exception as fallback_e:
-                raise RuntimeError(f"Error generating response: {e}, Fallback error: {fallback_e}")
+            # No plain-completion retry: without a chat template there is nothing
+            # format-specific to fall back from, and a second prefill of the same
+            # prompt would only double the latency of a real failure
+            raise RuntimeError(f"Error generating response: {e}")
 
+    @staticmethod
+    def _collect_commands(chunks) -> str:
+        """
+        Join streamed completion chunks, stopping once the commands are complete
+        
+        The model often keeps talking after its answer. The first non-empty line
+        that does not start with "git", after at least one that does, ends the
+        answer, so the remaining tokens are never decoded.
+        """
+        text = ""
+        checked = 0  # Offset of the first line not yet inspected
+        seen_git = False
+        for chunk in chunks:
+            text += chunk['choices'][0]['text']
+            end = text.find("\n", checked)
+            while end != -1:
+                line = text[checked:end].strip()
+                if line:
+                    if line.startswith("git"):
+                        seen_git = True
+                    elif seen_git:
+                        chunks.close()
+                        return text[:checked]
+                checked = end + 1
+                end = text.find("\n", checked)
+        return text
+    
+    def _get_prefix_tokens(self, prefix: str) -> Tuple[List[int], str]:
+        """Token IDs of the ChatML-framed prefix and their state key, computed once per prefix"""
+        if self._prefix_tokens is None or self._prefix_tokens[0] != prefix:
+            tokens = self.llm.tokenize((CHATML_PREFIX + prefix).encode("utf-8"), special=True)
+            key = hashlib.sha256("|".join([
+                getattr(llama_cpp, "__version__", ""),  # State layout changes between releases
+                self.model_path,
+                self.model_version,
+                str(self.n_ctx),
+                ",".join(map(str, tokens)),
+            ]).encode('utf-8')).hexdigest()
+            self._prefix_tokens = (prefix, tokens, key)
+        return self._prefix_tokens[1], self._prefix_tokens[2]
+    
+    def _restore_prefix_state(self, prefix_tokens: List[int], key: str) -> None:
+        """
+        Make the model's KV cache hold prefix_tokens, from disk when possible
+        
+        The completion call then only evaluates the tokens after the prefix.
+        Within one process (shell mode) the state stays loaded between queries.
+        """
+        if key == self._prefix_key:
+            return
+        
+        state_path = os.path.join(KV_CACHE_DIR, f"{key}.npz")
+        try:
+            self.llm.load_state(self._load_prefix_state(state_path))
+            os.utime(state_path)  # Mark as recently used for pruning
+        except (OSError, EOFError, zipfile.BadZipFile, KeyError, TypeError, ValueError, RuntimeError):
+            # Missing, corrupt, or written by an incompatible llama.cpp build
+            # (load_state raises RuntimeError); drop it and prefill again
+            with contextlib.suppress(OSError):
+                os.unlink(state_path)
+            self.llm.reset()
+            self.llm.eval(prefix_tokens)
+            self._store_prefix_state(state_path, self.llm.save_state())
+        
+        self._prefix_key = key
+    
+    @staticmethod
+    def _load_prefix_state(state_path: str):
+        """Read a state saved by _store_prefix_state; plain arrays, nothing is unpickled"""
+        with np.load(state_path, allow_pickle=False) as saved:
+            return llama_cpp.LlamaState(
+                input_ids=saved["input_ids"],
+                scores=saved["scores"],
+                n_tokens=int(saved["n_tokens"]),
+                llama_state=saved["llama_state"].tobytes(),
+                llama_state_size=int(saved["llama_state_size"]),
+                seed=int(saved["seed"]),
+            )
+    
+    @staticmethod
+    def _store_prefix_state(state_path: str, state) -> None:
+        """Atomically save a prefix state as plain arrays and prune the least recently used ones"""
+        try:
+            os.makedirs(KV_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=KV_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    input_ids=state.input_ids,
+                    # The per-token logits (n_batch x n_vocab floats, ~155MB for Qwen) are
+                    # only read for logprobs; keep one row, which load_state broadcasts back
+                    scores=state.scores[-1:],
+                    n_tokens=state.n_tokens,
+                    llama_state=np.frombuffer(state.llama_state, dtype=np.uint8),
+                    llama_state_size=state.llama_state_size,
+                    seed=state.seed,
+                )
+            os.replace(tmp_path, state_path)
+            
+            saved = sorted(
+                (entry for entry in os.scandir(KV_CACHE_DIR) if entry.name.endswith(".npz")),
+                key=lambda entry: entry.stat().st_mtime,
+                reverse=True
+            )
+            for entry in saved[KV_CACHE_MAX_FILES:]:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+    
     def cleanup(self):
         """Clean up resources"""
         if hasattr(self, 'llm'):
@@ -5,43 +5,56 @@ giti - Natural language to Git commands CLI tool
 """
 
 import argparse
+import functools
 import sys
 import os
-import atexit
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from llm_runner import LLMRunner
 from parser import PromptParser
-from executor import CommandExecutor
+from executor import CommandExecutor, ON_ERROR_POLICIES
+from daemon import DaemonClient
+from semcache import SemanticCache
+
+# llm_runner loads the llama.cpp extension; it is imported only when a model is needed
+if TYPE_CHECKING:
+    from llm_runner import LLMRunner
 
 # Store the original working directory where giti was invoked
 ORIGINAL_CWD = os.environ.get('GITI_ORIGINAL_CWD', os.getcwd())
 
-# Global model cache for speed
-_model_cache = {}
-_parser_cache = None
+# Interactive shell commands that end the session
+EXIT_COMMANDS = frozenset(['exit', 'quit', 'q'])
 
 
-def get_llm_runner(model_path: str) -> LLMRunner:
-    """Get cached LLM runner or create new one"""
-    global _model_cache
-    
-    if model_path not in _model_cache:
-        _model_cache[model_path] = LLMRunner(model_path)
-        # Register cleanup on exit
-        atexit.register(lambda: _model_cache[model_path].cleanup() if model_path in _model_cache else None)
-    
-    return _model_cache[model_path]
+def die(*lines: str):
+    """Report a fatal error on stderr in a single write and exit"""
+    sys.stderr.write("\n".join(lines) + "\n")
+    sys.exit(1)
+
+
+@functools.lru_cache(maxsize=2)
+def get_llm_runner(model_path: str, model_version: str, use_cache: bool = True,
+                   use_daemon: bool = True) -> "LLMRunner":
+    """Get cached LLM runner or create new one, preferring the background daemon"""
+    runner = DaemonClient.connect(model_path, use_cache=use_cache) if use_daemon else None
+    if runner is None:
+        # No daemon available, load the model in this process (LLMRunner registers its own cleanup)
+        from llm_runner import LLMRunner
+        runner = LLMRunner(model_path, model_version, use_cache=use_cache)
+    return runner
 
 
+@functools.cache
 def get_prompt_parser() -> PromptParser:
     """Get cached prompt parser or create new one"""
-    global _parser_cache
-    
-    if _parser_cache is None:
-        _parser_cache = PromptParser()
-    
-    return _parser_cache
+    return PromptParser()
+
+
+@functools.cache
+def get_semantic_cache() -> SemanticCache:
+    """Get the shared semantic query cache"""
+    return SemanticCache()
 
 
 def download_model(model_path: str):
@@ -124,6 +137,37 @@ def main():
         help="Skip confirmation prompts before execution"
     )
     
+    parser.add_argument(
+        "--on-error",
+        choices=ON_ERROR_POLICIES,
+        default="ask",
+        help="After a failed command: ask (default), abort, or continue without prompting"
+    )
+    
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Run commands strictly one after another"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable all caching: repeated-query reuse and cached model responses"
+    )
+    
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always query the model instead of reusing cached responses"
+    )
+    
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Load the model in-process instead of using the background daemon"
+    )
+    
     parser.add_argument(
         "--model-path",
         type=str,
@@ -144,56 +188,84 @@ def main():
         download_model(args.model_path)
         return
     
-    # Validate model file exists
-    if not os.path.exists(args.model_path):
-        print(f"❌ Model file not found at {args.model_path}")
-        print("📥 Please download the Qwen2.5-Coder-1.5B model:")
-        print("   giti --download-model")
-        print("   or manually:")
-        print("   wget https://huggingface.co/bartowski/Qwen2.5-Coder-1.5B-Instruct-GGUF/resolve/main/Qwen2.5-Coder-1.5B-Instruct-Q4_K_M.gguf")
-        sys.exit(1)
+    # Stat the model once; its size and mtime key the on-disk caches
+    try:
+        model_stat = os.stat(args.model_path)
+    except OSError:
+        die(
+            f"❌ Model file not found at {args.model_path}",
+            "📥 Please download the Qwen2.5-Coder-1.5B model:",
+            "   giti --download-model",
+            "   or manually:",
+            "   wget https://huggingface.co/bartowski/Qwen2.5-Coder-1.5B-Instruct-GGUF/resolve/main/Qwen2.5-Coder-1.5B-Instruct-Q4_K_M.gguf",
+        )
+    model_version = f"{model_stat.st_size}:{model_stat.st_mtime_ns}"
     
     # Initialize components (with caching for speed)
     try:
-        llm_runner = get_llm_runner(args.model_path)
+        llm_runner = get_llm_runner(
+            args.model_path,
+            model_version,
+            use_cache=not (args.no_cache or args.no_llm_cache),
+            use_daemon=not args.no_daemon
+        )
         prompt_parser = get_prompt_parser()
     except Exception as e:
-        print(f"❌ Error initializing components: {e}")
-        print("💡 Make sure the model file is valid and you have enough memory.")
-        sys.exit(1)
+        die(
+            f"❌ Error initializing components: {e}",
+            "💡 Make sure the model file is valid and you have enough memory.",
+        )
     
-    # Load context if provided
+    # Load context if provided. Answers depend on the model and the context
+    # file's contents as well as the query, so both go into the cache namespace
     context_data = None
+    cache_namespace = f"{os.path.abspath(args.model_path)}|{model_version}"
     if args.context:
-        if not os.path.exists(args.context):
-            print(f"❌ Context file not found at {args.context}")
-            print("💡 Make sure the file path is correct.")
-            sys.exit(1)
+        try:
+            context_stat = os.stat(args.context)
+        except OSError:
+            die(
+                f"❌ Context file not found at {args.context}",
+                "💡 Make sure the file path is correct.",
+            )
+        cache_namespace += f"|{os.path.abspath(args.context)}|{context_stat.st_size}:{context_stat.st_mtime_ns}"
         context_data = prompt_parser.load_context_file(args.context)
     
     if args.shell:
         # Interactive shell mode
-        run_interactive_shell(args, llm_runner, prompt_parser, context_data)
+        run_interactive_shell(args, llm_runner, prompt_parser, context_data, cache_namespace)
     elif args.query:
         # Single command mode
-        process_query(args.query, args, llm_runner, prompt_parser, context_data)
+        process_query(args.query, args, llm_runner, prompt_parser, context_data, cache_namespace)
     else:
         parser.print_help()
         sys.exit(1)
 
 
-def process_query(query: str, args, llm_runner: LLMRunner, prompt_parser: PromptParser, context_data=None):
+def process_query(query: str, args, llm_runner: "LLMRunner", prompt_parser: PromptParser, context_data=None,
+                  cache_namespace: str = ""):
     """Process a single natural language query"""
     try:
-        # Generate prompt with context
-        prompt = prompt_parser.generate_prompt(query, context_data)
+        semantic_cache = None if args.no_cache else get_semantic_cache()
+        cached = semantic_cache.lookup(query, cache_namespace) if semantic_cache else None
+        cacheable = False
         
-        # Get response from LLM
-        print("🤔 Thinking...")
-        raw_response = llm_runner.generate(prompt)
-        
-        # Parse commands
-        commands = prompt_parser.parse_commands(raw_response)
+        if cached:
+            cached_query, commands = cached
+            print(f"⚡ Reusing commands from an earlier query: '{cached_query}'")
+        else:
+            # Generate prompt with context; the prefix is the same for every query
+            prefix, suffix = prompt_parser.generate_prompt_parts(query, context_data)
+            
+            # Get response from LLM
+            print("🤔 Thinking...")
+            raw_response = llm_runner.generate(prefix + suffix, prefix=prefix)
+            
+            # Parse commands; only real answers are worth remembering, not the
+            # fallback for output without a single git command line
+            commands = prompt_parser.parse_commands(raw_response, fallback=False)
+            cacheable = semantic_cache is not None and bool(commands)
+            commands = commands or list(prompt_parser.FALLBACK_COMMANDS)
         
         if not commands:
             print("❌ Could not generate valid commands for that query.")
@@ -204,16 +276,22 @@ def process_query(query: str, args, llm_runner: LLMRunner, prompt_parser: Prompt
         executor = CommandExecutor(
             dry_run=args.dry_run, 
             no_confirm=args.no_confirm,
-            working_directory=ORIGINAL_CWD
+            working_directory=ORIGINAL_CWD,
+            sequential=args.sequential,
+            on_error=args.on_error
         )
-        executor.execute_commands(commands)
+        
+        # Remember the commands only once the user accepted them and they worked
+        if executor.execute_commands(commands) and cacheable:
+            semantic_cache.insert(query, commands, cache_namespace)
         
     except Exception as e:
         print(f"❌ Error processing query: {e}")
         print("💡 Try a simpler query or check if you're in a git repository.")
 
 
-def run_interactive_shell(args, llm_runner: LLMRunner, prompt_parser: PromptParser, context_data=None):
+def run_interactive_shell(args, llm_runner: "LLMRunner", prompt_parser: PromptParser, context_data=None,
+                          cache_namespace: str = ""):
     """Run interactive shell mode"""
     print("🌟 Welcome to giti interactive mode!")
     print("💡 Describe what you want to do in natural language")
@@ -223,14 +301,14 @@ def run_interactive_shell(args, llm_runner: LLMRunner, prompt_parser: PromptPars
         try:
             query = input("giti> ").strip()
             
-            if query.lower() in ['exit', 'quit', 'q']:
+            if query.lower() in EXIT_COMMANDS:
                 print("👋 Thanks for using giti!")
                 break
                 
             if not query:
                 continue
                 
-            process_query(query, args, llm_runner, prompt_parser, context_data)
+            process_query(query, args, llm_runner, prompt_parser, context_data, cache_namespace)
             print()
             
         except KeyboardInterrupt:
@@ -0,0 +1,120 @@
+"""
+Semantic Cache - Reuse commands for repeated queries without running the model
+"""
+
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# Where answered queries are persisted between invocations
+SEMANTIC_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "giti", "semcache.json"
+)
+
+MAX_ENTRIES = 1000
+
+# Articles and politeness words, which never change which git command a query
+# maps to. Words like "all", "file" or "this" set a command's scope and must stay
+FILLER_WORDS = frozenset([
+    "a", "an", "the", "please", "just", "me", "i", "want", "can", "could", "you",
+])
+
+_TOKEN_RE = re.compile(r'"[^"]*"|\'[^\']*\'|[^\s"\']+')
+
+
+class SemanticCache:
+    """Maps normalized queries to the commands that answered them"""
+    
+    def __init__(self, path: str = SEMANTIC_CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        """
+        Initialize the semantic cache
+        
+        Args:
+            path: JSON file the cache is persisted to
+            max_entries: Least recently used entries beyond this are evicted
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (namespace, normalized query) -> entry dict, in LRU order
+        self._load()
+    
+    def lookup(self, query: str, namespace: str = "") -> Optional[Tuple[str, List[str]]]:
+        """
+        Find commands for a query answered before
+        
+        Queries match when they are the same after dropping filler words and
+        case, so "show me the status" reuses the answer to "Show status". Every
+        other word counts: branch names, paths and numbers differ between
+        queries that otherwise look alike, and a near match would run the
+        commands for the wrong one.
+        
+        Args:
+            query: User's natural language query
+            namespace: Separates answers produced under different models/context files
+        
+        Returns:
+            (cached query, commands) for the match, or None
+        """
+        key = (namespace, self._normalize(query))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        self._entries.move_to_end(key)
+        return entry["query"], list(entry["commands"])
+    
+    def insert(self, query: str, commands: List[str], namespace: str = "") -> None:
+        """Remember the commands generated for a query and persist the cache"""
+        normalized = self._normalize(query)
+        if not normalized or not commands:
+            return
+        
+        key = (namespace, normalized)
+        self._entries.pop(key, None)
+        self._entries[key] = {
+            "query": query,
+            "namespace": namespace,
+            "normalized": normalized,
+            "commands": list(commands),
+        }
+        
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        
+        self._save()
+    
+    @staticmethod
+    def _normalize(query: str) -> str:
+        """Drop filler words and lowercase everything but quoted text"""
+        tokens = []
+        for token in _TOKEN_RE.findall(query):
+            if token.lower() in FILLER_WORDS:
+                continue
+            # Quoted text keeps its case: commit messages are case-sensitive
+            tokens.append(token if token[0] in "\"'" else token.lower())
+        return " ".join(tokens)
+    
+    def _load(self) -> None:
+        """Read persisted entries, ignoring a missing or corrupt file"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for entry in entries:
+                self._entries[(entry["namespace"], entry["normalized"])] = entry
+        except (OSError, ValueError, KeyError, TypeError):
+            self._entries.clear()
+    
+    def _save(self) -> None:
+        """Atomically persist entries in LRU order, ignoring I/O failures"""
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(list(self._entries.values()), f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass